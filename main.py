@@ -10,6 +10,9 @@ import re
 import time
 import math
 import base64
+import hashlib
+import threading
+from collections import OrderedDict
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -22,17 +25,24 @@ st.set_page_config(
 # --- Constantes ---
 MODEL_NAME = "gemini-2.5-pro-exp-03-25" # Modelo mais recente e geralmente mais rápido/barato
 PAGES_PER_BATCH = 2 # Analisar 2 páginas por vez
+# Orçamento (imagens decodificadas) do cache compartilhado entre sessões; padrão ~1 GB.
+# Limita apenas o que o cache retém: cada sessão ainda mantém suas páginas em
+# st.session_state.pdf_page_images. Uma página A4 a 200 dpi ocupa ~11.6 MB, então provas
+# com mais de ~90 páginas não cabem no padrão (veja o contador "grandes demais" na barra lateral).
+DOCUMENT_CACHE_MAX_BYTES = int(os.environ.get("DOCUMENT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+DOCUMENT_CACHE_TTL_SECONDS = 60 * 60 # Documentos convertidos expiram após 1 hora
 
 # --- Funções Auxiliares ---
 
-@st.cache_data(show_spinner="Convertendo PDF para imagens...")
-def convert_pdf_to_images(_pdf_bytes):
+def _render_pdf_pages(pdf_bytes):
     """Converts PDF bytes into a list of PIL Image objects."""
     images = []
     error_message = None
     # st.info("Iniciando conversão de PDF para imagens...") # Removido log de depuração
     try:
-        images = convert_from_bytes(_pdf_bytes, dpi=200, fmt='png', thread_count=os.cpu_count())
+        images = convert_from_bytes(pdf_bytes, dpi=200, fmt='png', thread_count=os.cpu_count())
+        for img in images:
+            img.load() # Decodifica agora: as páginas podem ser compartilhadas entre sessões (threads)
         if images: # Só mostra sucesso se realmente gerou imagens
              st.success(f"Conversão concluída: {len(images)} páginas geradas.") # Mantido feedback essencial
     except PDFInfoNotInstalledError:
@@ -57,6 +67,129 @@ def convert_pdf_to_images(_pdf_bytes):
 
     return images, error_message
 
+class ConvertedDocumentCache:
+    """
+    Process-wide LRU cache of converted PDFs, shared by every session.
+
+    Entries are keyed by the SHA-256 of the PDF bytes and evicted when the
+    estimated decoded size of all cached images exceeds `max_bytes` or when
+    they are older than `ttl_seconds`. Concurrent requests for the same key
+    wait for a single conversion and reuse its result, even when that result
+    is an error or too large to cache.
+
+    Cached images are shared between sessions (threads) and must already be
+    fully decoded (see `_render_pdf_pages`): treat them as read-only.
+    """
+
+    def __init__(self, max_bytes, ttl_seconds):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # digest -> (images, size_bytes, created_at)
+        self._in_flight = {} # digest -> {'event': threading.Event, 'result': (images, error) ou None}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0 # Sessões que aguardaram a conversão de outra sessão
+        self.oversize = 0 # Conversões maiores que max_bytes, não armazenadas
+
+    @staticmethod
+    def _estimate_size(images):
+        """Approximate decoded size in bytes of a list of PIL images."""
+        return sum(img.width * img.height * len(img.getbands()) for img in images)
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def _purge_expired(self, now):
+        expired = [k for k, (_, _, created) in self._entries.items() if now - created > self.ttl_seconds]
+        for key in expired:
+            self._drop(key)
+
+    def _store(self, key, images):
+        """Inserts a decoded entry and evicts least recently used ones. Caller holds the lock."""
+        size = self._estimate_size(images)
+        if size > self.max_bytes:
+            self.oversize += 1
+            return # Grande demais para o cache; não armazena
+        self._entries[key] = (images, size, time.monotonic())
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def get_or_create(self, key, convert):
+        """
+        Returns the cached images for `key`, running `convert()` at most once at a time per key.
+
+        Args:
+            key (str): Digest of the PDF bytes.
+            convert (callable): Returns (list of PIL.Image, error message or None).
+
+        Returns:
+            tuple: (list of PIL.Image, error message or None). Failed conversions are not cached.
+        """
+        while True:
+            with self._lock:
+                self._purge_expired(time.monotonic())
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(entry[0]), None
+                flight = self._in_flight.get(key)
+                if flight is None:
+                    flight = self._in_flight[key] = {'event': threading.Event(), 'result': None}
+                    self.misses += 1
+                    break
+            # Outra sessão já está convertendo este PDF: reutiliza o resultado dela
+            flight['event'].wait()
+            if flight['result'] is not None:
+                images, error_message = flight['result']
+                with self._lock:
+                    self.shared += 1
+                return list(images), error_message
+            # A conversão de origem lançou uma exceção: tenta novamente
+
+        try:
+            images, error_message = convert()
+            if not error_message and images:
+                with self._lock:
+                    self._store(key, images)
+            flight['result'] = (images, error_message)
+            return list(images), error_message
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight['event'].set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self.shared,
+                'oversize': self.oversize,
+            }
+
+@st.cache_resource
+def get_document_cache():
+    """Returns the single ConvertedDocumentCache instance for this process."""
+    return ConvertedDocumentCache(DOCUMENT_CACHE_MAX_BYTES, DOCUMENT_CACHE_TTL_SECONDS)
+
+def convert_pdf_to_images(pdf_bytes):
+    """
+    Converts PDF bytes into PIL images, reusing pages already converted by any session.
+
+    Returns:
+        tuple: (list of PIL.Image, error message or None). Failed conversions are not cached.
+    """
+    key = hashlib.sha256(pdf_bytes).hexdigest()
+    with st.spinner("Convertendo PDF para imagens..."):
+        return get_document_cache().get_or_create(key, lambda: _render_pdf_pages(pdf_bytes))
+
 def analyze_pages_with_gemini_multimodal(api_key, page_images_batch):
     """
     Analyzes a batch of PDF page images using Gemini's multimodal capabilities,
@@ -325,6 +458,13 @@ with st.sidebar:
     st.markdown("---")
     st.info("A precisão depende da qualidade da imagem e da capacidade da IA. Verifique os resultados.") # Mantido
     st.warning("**Dependência Externa:** Requer `poppler` instalado no ambiente de execução.") # Mantido
+    cache_stats = get_document_cache().stats()
+    st.caption(
+        f"Cache de documentos: {cache_stats['entries']} PDF(s), "
+        f"{cache_stats['bytes'] / (1024 * 1024):.0f} MB, "
+        f"{cache_stats['hits']} acertos / {cache_stats['misses']} falhas / "
+        f"{cache_stats['shared']} compartilhados / {cache_stats['oversize']} grandes demais"
+    )
 
 # --- Main Area Logic ---
 